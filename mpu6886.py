@@ -26,14 +26,19 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import sys
+import micropython
 import ustruct
 import utime
 from micropython import const
 
 
 class MPU6886:
-    """ MPU-6886 is a 6-axis motion tracking device that combines a 3-axis gyroscope and a 3-axis accelerometer """
+    """ MPU-6886 is a 6-axis motion tracking device that combines a 3-axis gyroscope and a 3-axis accelerometer
+
+    pass a hardware machine.I2C bus clocked at 400 kHz (the device's rated fast-mode speed) for best sample rates
+
+    units='mg' (default) returns acceleration in mG as int, units='ms2' in m/s^2 as float
+    """
 
     # Device specified MPU6886 registers
     SELF_TEST_X_ACCEL = const(13)
@@ -66,134 +71,246 @@ class MPU6886:
     FS_8G = b'\x10'
     FS_16G = b'\x18'
 
+    # contiguous X, Y, Z self test register runs, burst-read as one 3-byte transaction
+    _ACCEL_ST_REGS = (SELF_TEST_X_ACCEL, SELF_TEST_Y_ACCEL, SELF_TEST_Z_ACCEL)
+    _GYRO_ST_REGS = (SELF_TEST_X_GYRO, SELF_TEST_Y_GYRO, SELF_TEST_Z_GYRO)
+
+    # full scale mask -> dial lookup tables (accel in mG, gyro in dps)
+    _ACCEL_DIAL = {FS_2G: 2000, FS_4G: 4000, FS_8G: 8000, FS_16G: 16000}
+    _GYRO_DIAL = {FS_250DPS: 250, FS_500DPS: 500, FS_1000DPS: 1000, FS_2000DPS: 2000}
+
     # Self Test masks for X, Y and Z at highest sensor resolution
     ST_X = b'\x80'
     ST_Y = b'\x40'
     ST_Z = b'\x20'
+    ST_XYZ = b'\xE0'
 
     # temperature constants
     TEMP_OFFSET = 25
     TEMP_SO = 326.8
 
+    # deg F conversion folded to one multiply + add: degF = raw * _F_SLOPE + _F_OFFSET
+    _F_SLOPE = 1.8 / TEMP_SO
+    _F_OFFSET = 1.8 * TEMP_OFFSET + 32
+
     def __init__(self, i2c, **kwargs):
         """ initialize and save avg stationary 6-axis sensor readings and tolerance """
 
         self.i2c = i2c
-        self._imuparms = {'address': 0x68, 'accel_fs': MPU6886.FS_2G, 'accel_dial': None, 'gyro_fs': MPU6886.FS_250DPS,
-                          'gyro_dial': None, 'SG': 9.800665, 'accel_ft': None, 'gyro_ft': None, 'debug': False}
-        [print("* IGNORING ERROR invalid parm '{}'..".format(k)) for k in kwargs.keys() if
-         k not in self.imuparms.keys()]
-
-        [self.imuparms.update({k: v}) for k, v in kwargs.items()]
-
-        if self.imuparms['accel_fs'] == MPU6886.FS_2G:
-            self.imuparms['accel_dial'] = 2000
-        elif self.imuparms['accel_fs'] == MPU6886.FS_4G:
-            self.imuparms['accel_dial'] = 4000
-        elif self.imuparms['accel_fs'] == MPU6886.FS_8G:
-            self.imuparms['accel_dial'] = 8000
-        elif self.imuparms['accel_fs'] == MPU6886.FS_16G:
-            self.imuparms['accel_dial'] = 16000
-
-        if self.imuparms['gyro_fs'] == MPU6886.FS_250DPS:
-            self.imuparms['gyro_dial'] = 250
-        elif self.imuparms['gyro_fs'] == MPU6886.FS_500DPS:
-            self.imuparms['gyro_dial'] = 500
-        elif self.imuparms['gyro_fs'] == MPU6886.FS_1000DPS:
-            self.imuparms['gyro_dial'] = 10000
-        elif self.imuparms['gyro_fs'] == MPU6886.FS_2000DPS:
-            self.imuparms['gyro_dial'] = 20000
+
+        for k in kwargs:
+            if k not in ('address', 'accel_fs', 'accel_dial', 'gyro_fs', 'gyro_dial', 'SG',
+                         'accel_ft', 'gyro_ft', 'units', 'debug'):
+                print("* IGNORING ERROR invalid parm '{}'..".format(k))
+
+        # hot fields live as plain attributes -- a dict lookup per sample costs a string hash on MicroPython
+        self.addr = kwargs.get('address', 0x68)
+        self.accel_fs = kwargs.get('accel_fs', MPU6886.FS_2G)
+        self.gyro_fs = kwargs.get('gyro_fs', MPU6886.FS_250DPS)
+        self.sg = kwargs.get('SG', 9.800665)
+        self.debug = kwargs.get('debug', False)
+        self.units = kwargs.get('units', 'mg')
+        if self.units not in ('mg', 'ms2'):
+            print("* IGNORING ERROR invalid units '{}', using 'mg'..".format(self.units))
+            self.units = 'mg'
+
+        # debug messages dispatch through a prebound no-op when disabled, so the hot path pays one
+        # call instead of a flag test and the format work happens only when actually printing
+        if self.debug:
+            self._dbg = lambda fmt, *a: print(fmt.format(*a) if a else fmt)
+        else:
+            self._dbg = lambda fmt, *a: None
+        self.accel_ft = None
+        self.gyro_ft = None
+
+        self.accel_dial = MPU6886._ACCEL_DIAL[self.accel_fs]
+        self.gyro_dial = MPU6886._GYRO_DIAL[self.gyro_fs]
+
+        # precomputed per-count scale factors keep dial lookups and divisions out of the sample path;
+        # _conv picks the return type per the units choice so the sample comprehensions stay branch free
+        if self.units == 'mg':
+            self._accel_scale = self.accel_dial / 32768
+            self._accel_uom = 'mG'
+            self._conv = int
+        else:
+            self._accel_scale = self.accel_dial * self.sg / 32768000
+            self._accel_uom = 'm/s2'
+            self._conv = float
+        self._gyro_scale = self.gyro_dial / 32768
+
+        # cache bound I2C methods -- saves two attribute lookups per transaction
+        self._read = i2c.readfrom_mem
+        self._read_into = i2c.readfrom_mem_into
+        self._write = i2c.writeto_mem
+
+        # reusable receive buffer and sized views keep the steady-state read path allocation free,
+        # avoiding GC pauses in high rate sample loops
+        self._rxbuf = bytearray(14)
+        rxmv = memoryview(self._rxbuf)
+        self._rxmv1 = rxmv[:1]
+        self._rxmv2 = rxmv[:2]
+        self._rxmv6 = rxmv[:6]
 
         # validate existence of IMU
-        if self.reg(MPU6886.WHO_AM_I) != b'\x19':
+        if self.reg_read_u8(MPU6886.WHO_AM_I) != 0x19:
             raise RuntimeError("MPU6886 not found in I2C bus.")
         else:
-            if self.imuparms['debug']:
-                print("* IMU id verified")
+            self._dbg("* IMU id verified")
 
         # Gyro low power mode standby
-        self.reg(MPU6886.PWR_MGMT_1, MPU6886.GYRO_STANDBY)
+        self.reg_write(MPU6886.PWR_MGMT_1, MPU6886.GYRO_STANDBY)
         utime.sleep_ms(100)
-        if self.imuparms['debug']:
-            print("* Set gyro in lowpower standby mode..")
+        self._dbg("* Set gyro in lowpower standby mode..")
 
         # auto select clock
-        self.reg(MPU6886.PWR_MGMT_1, MPU6886.CLKSEL)
-        if self.imuparms['debug']:
-            print("* set autoselect clock..")
+        self.reg_write(MPU6886.PWR_MGMT_1, MPU6886.CLKSEL)
+        utime.sleep_ms(10)
+        self._dbg("* set autoselect clock..")
 
             # set accel full scale 2000 mG
-        self.reg(MPU6886.ACCEL_CONFIG, self.imuparms['accel_fs'])
-        if self.imuparms['debug']:
-            print("* set acceleration dial@ {} mG".format(self.imuparms['accel_dial']))
-        
+        self.reg_write(MPU6886.ACCEL_CONFIG, self.accel_fs)
+        self._dbg("* set acceleration dial@ {} mG", self.accel_dial)
+
         # set gyr0 full scale 250 dps/s
         utime.sleep_ms(10)
-        self.reg(MPU6886.GYRO_CONFIG, self.imuparms['gyro_fs'])
-        if self.imuparms['debug']:
-            print("* set gyro dial@ {} dps/s".format(self.imuparms['gyro_dial']))
-        
+        self.reg_write(MPU6886.GYRO_CONFIG, self.gyro_fs)
+        self._dbg("* set gyro dial@ {} dps/s", self.gyro_dial)
+
         # save factoy trim for self test
-        self.imuparms['accel_ft'] = self._ft(sensor='accel')
-        self.imuparms['gyro_ft'] = self._ft(sensor='gyro')
+        self.accel_ft = self._ft(sensor='accel')
+        self.gyro_ft = self._ft(sensor='gyro')
 
-        if self.imuparms['debug']:
-            print("* Initialization complete")
+        self._dbg("* Initialization complete")
 
     @property
     def imuparms(self):
-        return self._imuparms
+        """ legacy dict view of the configuration, rebuilt on demand from the attributes """
+
+        return {'address': self.addr, 'accel_fs': self.accel_fs, 'accel_dial': self.accel_dial,
+                'gyro_fs': self.gyro_fs, 'gyro_dial': self.gyro_dial, 'SG': self.sg,
+                'accel_ft': self.accel_ft, 'gyro_ft': self.gyro_ft, 'units': self.units,
+                'debug': self.debug}
+
+    @micropython.native
+    def reg_write(self, r, val):
+        """ write 'val' bytes into register 'r' """
+
+        self._write(self.addr, r, val)
+        self._dbg("* reg#{} <- {}", r, val)
+
+    @micropython.native
+    def reg_read_u8(self, r):
+        """ returns register 'r' as an unsigned byte """
 
-    @imuparms.setter
-    def imuparms(self, value):
-        self._imuparms = value
+        self._read_into(self.addr, r, self._rxmv1)
+        v = self._rxbuf[0]
+        self._dbg("* reg#{} -> {}", r, v)
+        return v
+
+    @micropython.native
+    def reg_read_i16(self, r):
+        """ returns registers 'r', 'r+1' as one big-endian signed 16-bit value """
+
+        self._read_into(self.addr, r, self._rxmv2)
+        v = ustruct.unpack_from(">h", self._rxbuf)[0]
+        self._dbg("* reg#{} -> {}", r, v)
+        return v
+
+    @micropython.native
+    def reg_read_i16x3(self, r):
+        """ returns the 6 bytes at register 'r' as three big-endian signed 16-bit values """
+
+        self._read_into(self.addr, r, self._rxmv6)
+        v = ustruct.unpack_from(">hhh", self._rxbuf)
+        self._dbg("* reg#{} -> {}", r, v)
+        return v
 
     def reg(self, r, val=None, nbytes=1):
-        """ read and write 'val if not None' into register for specified num of bytes """
+        """ back-compat shim over the specialized register accessors """
 
         if val is not None:
-            self.i2c.writeto_mem(self.imuparms['address'], r, val)
-        utime.sleep_ms(1)
-        byt = self.i2c.readfrom_mem(self.imuparms['address'], r, nbytes)
+            self.reg_write(r, val)
         if nbytes == 6:
-            byt = ustruct.unpack(">hhh", byt)
+            return self.reg_read_i16x3(r)
         elif nbytes == 2:
-            byt = ustruct.unpack(">h", byt)
-        if self.imuparms['debug']:
-            print("* reg#{} {} bytes -> {}".format(r, nbytes, byt))
-        return byt
+            return (self.reg_read_i16(r),)
+        return self._read(self.addr, r, nbytes)
+
+    @micropython.native
+    def read_all(self):
+        """ returns accel x, y, z mG, gyro x, y, z dps and temperature deg F from one 14-byte burst read """
+
+        self._read_into(self.addr, MPU6886.ACCEL_XOUT_H, self._rxbuf)
+        ax, ay, az, t, gx, gy, gz = ustruct.unpack_from(">hhhhhhh", self._rxbuf)
+        sa = self._accel_scale
+        sg = self._gyro_scale
+        c = self._conv
+        accel = tuple([c(sa * val) for val in (ax, ay, az)])
+        gyro = tuple([c(sg * val) for val in (gx, gy, gz)])
+        t = round(t * MPU6886._F_SLOPE + MPU6886._F_OFFSET, 1)
+        self._dbg("* read_all -> accl {} {}, gyro {} dps, temperature {} deg F", accel, self._accel_uom, gyro, t)
+        return accel, gyro, t
 
     @property
     def temperature(self):
         """ Die temperature in deg F  """
 
-        t = self.reg(MPU6886.TEMP_OUT_H, nbytes=2)[0]
-        t = (t / MPU6886.TEMP_SO) + MPU6886.TEMP_OFFSET
-        t = round(((1.8 * t) + 32), 1)
-        if self.imuparms['debug']:
-            print("* imu temperature deg F -> ", t)
+        raw = self.reg_read_i16(MPU6886.TEMP_OUT_H)
+        t = round(raw * MPU6886._F_SLOPE + MPU6886._F_OFFSET, 1)
+        self._dbg("* imu temperature deg F -> {}", t)
         return t
 
     @property
+    @micropython.native
     def accel(self):
-        """ returns tuple of X, Y, Z axis acceleration values mg (milli SG) as int """
+        """ returns tuple of X, Y, Z axis acceleration in mG as int, or m/s^2 as float with units='ms2' """
 
-        xyz = self.reg(MPU6886.ACCEL_XOUT_H, nbytes=6)
-        result = tuple([int(self.imuparms['accel_dial'] * val / 32768) for val in xyz])
-        if self.imuparms['debug']:
-            print("  accl -> {} @fs = {} mG".format(result, self.imuparms['accel_dial']))
+        xyz = self.reg_read_i16x3(MPU6886.ACCEL_XOUT_H)
+        s = self._accel_scale
+        c = self._conv
+        result = tuple([c(s * val) for val in xyz])
+        self._dbg("  accl -> {} {} @fs = {} mG", result, self._accel_uom, self.accel_dial)
         return result
 
     @property
+    @micropython.native
     def gyro(self):
-        """ returns tuple of X, Y, Z axis gyro values in deg/sec as int. """
+        """ returns tuple of X, Y, Z axis gyro values in deg/sec as int, or float with units='ms2' """
 
-        xyz = self.reg(MPU6886.GYRO_XOUT_H, nbytes=6)
-        gyro = tuple([int(self.imuparms['gyro_dial'] * val / 32768) for val in xyz])
-        if self.imuparms['debug']:
-            print("  gyro -> {} @fs = {} dps".format(gyro, self.imuparms['gyro_dial']))
+        xyz = self.reg_read_i16x3(MPU6886.GYRO_XOUT_H)
+        s = self._gyro_scale
+        c = self._conv
+        gyro = tuple([c(s * val) for val in xyz])
+        self._dbg("  gyro -> {} @fs = {} dps", gyro, self.gyro_dial)
         return gyro
 
+    def avg(self, sensor='accel', count=10, delay=10):
+        """ returns avg of 'count' samples spaced 'delay' ms apart as x, y, z tuple for sensor 'accel' or 'gyro' """
+
+        if sensor not in ('accel', 'gyro'):
+            print("* no implementation for sensor = {}".format(sensor))
+            return
+
+        idx = 0 if sensor == 'accel' else 1
+        read = self.read_all
+        xt = yt = zt = 0
+        deadline = utime.ticks_ms()
+        for _ in range(count):
+            x, y, z = read()[idx]
+            xt += x
+            yt += y
+            zt += z
+            # deadline pacing absorbs the I2C read time into 'delay' instead of adding on top of it
+            deadline = utime.ticks_add(deadline, delay)
+            rem = utime.ticks_diff(deadline, utime.ticks_ms())
+            if rem > 0:
+                utime.sleep_ms(rem)
+        # rounding is a display concern -- return full precision for downstream sensor fusion
+        val = tuple([v / count for v in (xt, yt, zt)])
+        self._dbg("* avg {} over {} samples -> ({:.1f}, {:.1f}, {:.1f}) {}",
+                  sensor, count, val[0], val[1], val[2], self._accel_uom if sensor == 'accel' else 'dps')
+        return val
+
     def _ft(self, sensor):
         """ returns factory trim values as a 3-int tuple for self test in UOM og mg or dps """
         dial = None
@@ -202,11 +319,8 @@ class MPU6886:
         elif sensor == 'gyro':
             dial = 250
 
-        trim = []
-        xyz = [getattr(MPU6886, 'SELF_TEST_' + axis + sensor.upper()) for axis in ('X_', 'Y_', 'Z_')]
-
-        tuple([trim.append(int(dial * int.from_bytes(v, sys.byteorder) / 32768))
-               for v in [self.reg(r) for r in xyz]])
+        regs = MPU6886._ACCEL_ST_REGS if sensor == 'accel' else MPU6886._GYRO_ST_REGS
+        trim = [int(dial * v / 32768) for v in self._read(self.addr, regs[0], 3)]
 
         print("* IMU {} factory trims x, y, z -> {} {}".format(sensor, trim, 'mG' if sensor == 'accel' else 'dps'))
         return trim
@@ -215,27 +329,26 @@ class MPU6886:
         """ return self test response 'res' -> difference in readings with self test enabled and disabled """
 
         r = getattr(MPU6886, sensor.upper() + '_CONFIG')
+        out = MPU6886.ACCEL_XOUT_H if sensor == 'accel' else MPU6886.GYRO_XOUT_H
+        # self test always runs at the lowest full scale, so scale raw counts with the matching dial
+        # regardless of the configured full scale or units -- the factory trims are in mG / dps
+        dial = 2000 if sensor == 'accel' else 250
 
-        enabled = []
-        for i, mask in enumerate((MPU6886.ST_X, MPU6886.ST_Y, MPU6886.ST_Z)):
-            self.reg(r, mask)
-            utime.sleep_ms(10)
-            enabled.append(getattr(self, sensor)[i])
+        # the device runs self test on all three axes concurrently, so one enable + one burst read covers X, Y, Z
+        self.reg_write(r, MPU6886.ST_XYZ)
+        utime.sleep_ms(10)
+        enabled = [int(dial * v / 32768) for v in self.reg_read_i16x3(out)]
 
-        fs = None
-        if sensor == 'accel':
-            fs = MPU6886.FS_2G
-        elif sensor == 'gyro':
-            fs = MPU6886.FS_250DPS
-        self.reg(r, fs)
+        fs = MPU6886.FS_2G if sensor == 'accel' else MPU6886.FS_250DPS
+        self.reg_write(r, fs)
         utime.sleep_ms(10)
-        disabled = getattr(self, sensor)
+        disabled = [int(dial * v / 32768) for v in self.reg_read_i16x3(out)]
 
         st_r = tuple(x - y for x, y in zip(enabled, disabled))
-        self.reg(r, self.imuparms[sensor + '_fs'])
+        self.reg_write(r, getattr(self, sensor + '_fs'))
 
         print("* {} self test response x, y, z -> {} {}\n  should be less than factory trim values -> {}".format(
-            sensor, st_r, 'mG' if sensor == 'accel' else 'dps', self.imuparms[sensor + '_ft']))
+            sensor, st_r, 'mG' if sensor == 'accel' else 'dps', getattr(self, sensor + '_ft')))
 
         return st_r
 
@@ -257,8 +370,10 @@ class MPU6886:
         if max(st) > 2 * tolerance:
             result = {0: "failed", 1: "failed", 2: "failed"}
 
-            ft = self.imuparms[sensor + '_ft']
-            [result.update({i: "passed"}) for i, (x, y) in enumerate(zip(st, ft)) if x <= y]
+            ft = getattr(self, sensor + '_ft')
+            for i, (x, y) in enumerate(zip(st, ft)):
+                if x <= y:
+                    result[i] = "passed"
             result = tuple(result.values())
             print("* {} selftest x, y, z -> {}, allowable tolerance of 2*{} {}".format(
                 sensor, result, tolerance, 'mG' if sensor == 'accel' else 'dps'))
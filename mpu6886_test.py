@@ -6,9 +6,10 @@ if __name__ == "__main__":
     if __name__ == "__main__":
         """ test MPU6886 class """
 
-        from machine import SoftI2C, Pin
+        from machine import I2C, Pin
 
-        i2c = SoftI2C(scl=Pin(22), sda=Pin(21))
+        # hardware I2C at 400 kHz -- SoftI2C bit-bangs near 100 kHz and quadruples transaction time
+        i2c = I2C(0, scl=Pin(22), sda=Pin(21), freq=400000)
 
         print("main> Initializing  IMU ..")
         imu = MPU6886(i2c, debug=False)
@@ -31,5 +32,6 @@ if __name__ == "__main__":
         temp = imu.temperature
 
         print("main> imuparms ..")
-        [print('  ', k, '->', v) for k, v in imu.imuparms.items()]
+        for k, v in imu.imuparms.items():
+            print('  ', k, '->', v)
 